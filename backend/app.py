@@ -1,42 +1,83 @@
 from __future__ import annotations
 
-import io
+import atexit
+import contextlib
+import copy
+import functools
+import hashlib
 import logging
+import multiprocessing
+import queue
+import sqlite3
+import tempfile
+import threading
 from collections import OrderedDict
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-import requests
+import httpx
+import numpy as np
 from flask import Flask, jsonify, request
 from PIL import Image
 
+from image_decode import decode_thumbnail, decode_thumbnail_image
+
 import os
 import json
 from collections import Counter
 
+# Optional C-backed JSON codec for request bodies and ranked responses.
+try:
+  import orjson
+except ImportError:  # pragma: no cover - optional accelerator
+  orjson = None
+
+# Optional C-backed Aho-Corasick matcher for the keyword scans in /search.
+try:
+  import ahocorasick
+except ImportError:  # pragma: no cover - optional accelerator
+  ahocorasick = None
+
 # Use a lightweight pure-Python scorer by default so the backend starts
 # quickly for local extension testing. Set environment variable
 # `AIS_ENABLE_ML=1` to attempt loading heavy ML libraries instead.
-USE_FALLBACK = os.environ.get("AIS_ENABLE_ML", "0") != "1"
+# Decode worker processes started by `python app.py` (always the case on
+# Windows, where processes are spawned) re-import this script as __mp_main__;
+# they only run image_decode, so they never load the models.
+USE_FALLBACK = os.environ.get("AIS_ENABLE_ML", "0") != "1" or __name__ == "__mp_main__"
 SentenceTransformer = None
-util = None
 torch = None
-TfidfVectorizer = None
-LogisticRegression = None
+HashingVectorizer = None
+SGDClassifier = None
+joblib = None
+# Intra-op threads for model inference; containers often report too few by default
+TORCH_THREADS = int(os.environ.get("AIS_TORCH_THREADS", os.cpu_count() or 1))
 if not USE_FALLBACK:
+  # OpenMP reads this once, when torch loads
+  os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_THREADS))
   try:
     import torch
-    from sentence_transformers import SentenceTransformer, util
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.linear_model import LogisticRegression
+    from sentence_transformers import SentenceTransformer
+    import joblib
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
   except Exception as exc:  # pragma: no cover - runtime fallback
     USE_FALLBACK = True
     SentenceTransformer = None
-    util = None
     torch = None
-    TfidfVectorizer = None
-    LogisticRegression = None
+    HashingVectorizer = None
+    SGDClassifier = None
+    joblib = None
     logging.warning("ML imports failed, using fallback text scorer: %s", exc)
 
+if not USE_FALLBACK:
+  torch.set_num_threads(TORCH_THREADS)
+  try:
+    # Requests already run on separate threads; keep one inter-op worker
+    torch.set_num_interop_threads(1)
+  except RuntimeError:  # pragma: no cover - only settable before the first parallel op
+    pass
+
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -48,12 +89,62 @@ CLIP_MODEL_NAME = "clip-ViT-B-32"
 # Prioritize text semantic understanding (60%) over image (40%) for better accuracy
 TEXT_WEIGHT = float(os.environ.get("AIS_TEXT_WEIGHT", "0.6"))
 IMAGE_WEIGHT = float(os.environ.get("AIS_IMAGE_WEIGHT", "0.4"))
-IMAGE_CACHE_MAX = 128
+# Items whose text score is below this gate skip the thumbnail download and CLIP
+# entirely; they are already near-eliminated by the text filter. -1 disables it.
+TEXT_GATE = float(os.environ.get("AIS_TEXT_GATE", "0.15"))
+IMAGE_CACHE_MAX = 4096  # fp16 512-d vectors, ~1 KB each
+TEXT_CACHE_MAX = 4096
+# Thumbnail downloads are network-bound, so overlap them on a small thread pool
+IMAGE_FETCH_WORKERS = int(os.environ.get("AIS_IMAGE_FETCH_WORKERS", "16"))
+IMAGE_ENCODE_BATCH_SIZE = 32
+TEXT_ENCODE_BATCH_SIZE = 64
+# Decode thumbnails in this many worker processes instead of on the fetch threads
+# (0 keeps decoding in-process).
+DECODE_PROCESSES = int(os.environ.get("AIS_DECODE_PROCESSES", "0"))
+# Seconds to wait for a worker; a stuck decode fails like an undecodable thumbnail
+DECODE_TIMEOUT = 10.0
+# Persist thumbnail and item-text embeddings to SQLite so restarts don't
+# re-run CLIP and the text models on content they have already seen
+USE_DISK_CACHE = os.environ.get("AIS_DISK_CACHE", "0") == "1"
+DISK_CACHE_PATH = os.environ.get(
+  "AIS_DISK_CACHE_PATH",
+  os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.sqlite3"),
+)
+# Where the feedback classifier is saved after each /feedback update
+NEGATIVE_MODEL_PATH = os.environ.get(
+  "AIS_NEGATIVE_MODEL_PATH",
+  os.path.join(os.path.dirname(os.path.abspath(__file__)), "negative_classifier.joblib"),
+)
+NEGATIVE_TRAIN_EPOCHS = 5  # partial_fit passes over each batch of new feedback
+# Most recent feedback entries remembered as already learned; older ones could
+# be learned again if the extension still resends them
+LEARNED_FEEDBACK_MAX = 10000
 
 # Use multi-model ensemble if enabled
 USE_ENSEMBLE = os.environ.get("AIS_USE_ENSEMBLE", "0") == "1"
 ENSEMBLE_WEIGHTS = [0.6, 0.4]  # Weight primary model (all-mpnet) 60%, secondary (MiniLM) 40%
 
+# Compile the transformer backbones with torch.compile at startup (slower boot, faster requests)
+USE_TORCH_COMPILE = os.environ.get("AIS_TORCH_COMPILE", "0") == "1"
+# Device for every model; unset picks CUDA, then Apple MPS, then CPU
+DEVICE = os.environ.get("AIS_DEVICE")
+if not USE_FALLBACK and not DEVICE:
+  if torch.cuda.is_available():
+    DEVICE = "cuda"
+  elif torch.backends.mps.is_available():
+    DEVICE = "mps"
+  else:
+    DEVICE = "cpu"
+DEVICE_TYPE = "cpu" if USE_FALLBACK else torch.device(DEVICE).type
+# Mixed-precision inference: FP16 on CUDA/MPS, BF16 autocast on CPU
+USE_FP16 = os.environ.get("AIS_FP16", "0") == "1"
+# INT8 dynamic quantization of Linear layers for CPU-only deployments
+# (AIS_QUANTIZE=1 is accepted as an alias)
+USE_INT8 = "1" in (os.environ.get("AIS_INT8", "0"), os.environ.get("AIS_QUANTIZE", "0"))
+# Run the text models on ONNX Runtime (needs `pip install sentence-transformers[onnx]`);
+# CLIP always stays on PyTorch
+USE_ONNX = os.environ.get("AIS_USE_ONNX", "0") == "1"
+
 # Query intent classification: detect user intent and adjust weights
 INTENT_KEYWORDS = {
   "how_to": [
@@ -233,117 +324,655 @@ QUERY_EXPANSIONS = {
   ]
 }
 
+# Freeze keyword tables into tuples once at import so request code only reads them
+INTENT_KEYWORDS = {intent: tuple(keywords) for intent, keywords in INTENT_KEYWORDS.items()}
+RECENCY_KEYWORDS = {bucket: tuple(keywords) for bucket, keywords in RECENCY_KEYWORDS.items()}
+BRAND_KEYWORDS = {key: tuple(keywords) for key, keywords in BRAND_KEYWORDS.items()}
+FRUIT_KEYWORDS = {key: tuple(keywords) for key, keywords in FRUIT_KEYWORDS.items()}
+FLOWER_KEYWORDS = {key: tuple(keywords) for key, keywords in FLOWER_KEYWORDS.items()}
+TOPIC_CATEGORIES = {category: tuple(keywords) for category, keywords in TOPIC_CATEGORIES.items()}
+MUSIC_KEYWORDS = tuple(MUSIC_KEYWORDS)
+
+# Keyword groups counted per result in /search, keyed by (category, query).
+KeywordGroup = Tuple[str, str]
+MUSIC_GROUP: KeywordGroup = ("music", "")
+KEYWORD_GROUPS: Dict[KeywordGroup, Tuple[str, ...]] = {MUSIC_GROUP: MUSIC_KEYWORDS}
+KEYWORD_GROUPS.update({("brand", key): keywords for key, keywords in BRAND_KEYWORDS.items()})
+KEYWORD_GROUPS.update({("fruit", key): keywords for key, keywords in FRUIT_KEYWORDS.items()})
+KEYWORD_GROUPS.update({("flower", key): keywords for key, keywords in FLOWER_KEYWORDS.items()})
+KEYWORD_GROUPS.update({("intent", intent): keywords for intent, keywords in INTENT_KEYWORDS.items()})
+KEYWORD_GROUPS.update({("recency", bucket): keywords for bucket, keywords in RECENCY_KEYWORDS.items()})
+KEYWORD_GROUPS.update({("topic", category): keywords for category, keywords in TOPIC_CATEGORIES.items()})
+INTENT_GROUPS: List[KeywordGroup] = [("intent", intent) for intent in INTENT_KEYWORDS]
+TOPIC_GROUPS: List[KeywordGroup] = [("topic", category) for category in TOPIC_CATEGORIES]
+# Checked in priority order by detect_recency
+RECENCY_BOOSTS: Tuple[Tuple[KeywordGroup, float], ...] = (
+  (("recency", "very_recent"), 1.5),  # 50% boost for content from today/hours ago
+  (("recency", "recent"), 1.3),  # 30% boost for week-old content
+  (("recency", "somewhat_recent"), 1.1),  # 10% boost for month-old content
+)
+
+
+def build_keyword_automaton(groups: Dict[KeywordGroup, Tuple[str, ...]]) -> Any:
+  """Compile every keyword group into one automaton so content is scanned once."""
+  if ahocorasick is None:
+    return None
+  owners: Dict[str, List[KeywordGroup]] = {}
+  for group, keywords in groups.items():
+    for keyword in keywords:
+      owners.setdefault(keyword, []).append(group)
+  automaton = ahocorasick.Automaton()
+  for keyword, keyword_groups in owners.items():
+    automaton.add_word(keyword, (keyword, tuple(keyword_groups)))
+  automaton.make_automaton()
+  return automaton
+
+
+KEYWORD_AUTOMATON = build_keyword_automaton(KEYWORD_GROUPS)
+
+
+def count_keyword_groups(text: str, groups: List[KeywordGroup]) -> Dict[KeywordGroup, int]:
+  """Count how many distinct keywords from each requested group occur in text."""
+  counts = {group: 0 for group in groups}
+  if KEYWORD_AUTOMATON is None:
+    for group in groups:
+      counts[group] = sum(1 for kw in KEYWORD_GROUPS[group] if kw in text)
+    return counts
+
+  seen = set()
+  for _, (keyword, keyword_groups) in KEYWORD_AUTOMATON.iter(text):
+    if keyword in seen:
+      continue
+    seen.add(keyword)
+    for group in keyword_groups:
+      if group in counts:
+        counts[group] += 1
+  return counts
+
 # If the heavy models loaded successfully, instantiate them. Otherwise
 # keep None and the code will use a simple fallback scorer.
+def load_text_model(name: str) -> Any:
+  """Load a text model on the ONNX Runtime backend when AIS_USE_ONNX=1, else PyTorch."""
+  if USE_ONNX:
+    try:
+      return SentenceTransformer(name, device=DEVICE, backend="onnx")
+    except Exception as e:
+      logging.warning("ONNX backend unavailable for %s, using PyTorch: %s", name, e)
+  return SentenceTransformer(name, device=DEVICE)
+
+
 model = None
 secondary_model = None
 clip_model = None
 if not USE_FALLBACK:
-  model = SentenceTransformer(MODEL_NAME)
+  model = load_text_model(MODEL_NAME)
   if USE_ENSEMBLE:
     try:
-      secondary_model = SentenceTransformer(SECONDARY_MODEL_NAME)
+      secondary_model = load_text_model(SECONDARY_MODEL_NAME)
     except Exception as e:
       logging.warning("Failed to load secondary model for ensemble: %s", e)
-  clip_model = SentenceTransformer(CLIP_MODEL_NAME)
+  clip_model = SentenceTransformer(CLIP_MODEL_NAME, device=DEVICE)
+  # Inference only: no dropout and no autograd bookkeeping. Grad mode is
+  # thread-local, so request threads still rely on inference_context below.
+  torch.set_grad_enabled(False)
+  for st_model in (model, secondary_model, clip_model):
+    if st_model is not None:
+      st_model.eval()
+
+
+def autocast_supported(device_type: str) -> bool:
+  """Whether this torch build can autocast on device_type (MPS needs torch 2.5+)."""
+  is_autocast_available = getattr(torch.amp, "is_autocast_available", None)
+  if is_autocast_available is None:
+    return device_type in ("cpu", "cuda")
+  return is_autocast_available(device_type)
+
+
+# Where autocast is unavailable the .half() weights below run without it
+USE_AUTOCAST = not USE_FALLBACK and USE_FP16 and autocast_supported(DEVICE_TYPE)
+
+
+def inference_context() -> contextlib.ExitStack:
+  """torch.inference_mode, plus autocast to half precision when AIS_FP16=1."""
+  stack = contextlib.ExitStack()
+  stack.enter_context(torch.inference_mode())
+  if USE_AUTOCAST:
+    if DEVICE_TYPE == "cpu":
+      stack.enter_context(torch.autocast("cpu", dtype=torch.bfloat16))
+    else:
+      stack.enter_context(torch.autocast(DEVICE_TYPE, dtype=torch.float16))
+  return stack
+
+
+# Concurrent request threads take turns on the GPU so their forward passes are
+# not interleaved kernel by kernel; CPU encodes still run side by side
+accelerator_lock = threading.Lock() if DEVICE_TYPE != "cpu" else contextlib.nullcontext()
+
+
+def encode(st_model: Any, inputs: Any, **kwargs: Any) -> torch.Tensor:
+  """Encode text or images into normalized float32 embeddings."""
+  with accelerator_lock, inference_context():
+    embeddings = st_model.encode(
+      inputs,
+      convert_to_tensor=True,
+      normalize_embeddings=True,
+      show_progress_bar=False,
+      **kwargs,
+    )
+  return embeddings.float()
+
+
+def loaded_models() -> List[Any]:
+  return [m for m in (model, secondary_model, clip_model) if m is not None]
+
+
+def torch_models() -> List[Any]:
+  """Loaded models running on PyTorch; ONNX ones cannot be halved, quantized or compiled."""
+  return [m for m in loaded_models() if getattr(m, "backend", "torch") == "torch"]
+
 
+if not USE_FALLBACK and USE_FP16 and DEVICE_TYPE != "cpu":
+  for st_model in torch_models():
+    st_model.half()
 
-class ImageEmbeddingCache:
-  def __init__(self, max_size: int) -> None:
+
+def replace_backbone(st_model: Any, transform: Any) -> Any:
+  """Swap the transformer inside a SentenceTransformer for transform(backbone).
+
+  Returns the previous backbone so callers can restore it. Compiling the
+  wrapper itself does not work because `encode` is not its `forward`.
+  """
+  first = st_model[0]
+  # Older releases register the backbone as `auto_model` (text) or `model`
+  # (CLIP); newer ones always store `model` and expose `auto_model` read-only.
+  children = dict(first.named_children())
+  attr = "auto_model" if "auto_model" in children else "model"
+  previous = getattr(first, attr)
+  setattr(first, attr, transform(previous))
+  return previous
+
+
+def warm_up_models() -> None:
+  """Run one throwaway forward pass per model so lazy compilation happens at boot."""
+  for st_model in (model, secondary_model):
+    if st_model is not None:
+      encode(st_model, ["warmup"])
+  if clip_model is not None:
+    encode(clip_model, ["warmup"])
+    encode(clip_model, [Image.new("RGB", (224, 224))])
+
+
+def compile_models() -> None:
+  """torch.compile every backbone, falling back to eager mode if compilation fails."""
+  originals = []
+  try:
+    for st_model in torch_models():
+      previous = replace_backbone(
+        st_model, lambda module: torch.compile(module, mode="reduce-overhead", dynamic=True)
+      )
+      originals.append((st_model, previous))
+    warm_up_models()
+    logging.info("Compiled %d models with torch.compile", len(originals))
+  except Exception as exc:  # pragma: no cover - depends on the local toolchain
+    logging.warning("torch.compile failed, using eager models: %s", exc)
+    for st_model, previous in originals:
+      replace_backbone(st_model, lambda _module, previous=previous: previous)
+
+
+def quantize_models(models: List[Any]) -> None:
+  """Swap Linear layers for INT8 dynamically-quantized ones (FBGEMM/oneDNN kernels)."""
+  for st_model in models:
+    try:
+      replace_backbone(
+        st_model,
+        lambda module: torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8),
+      )
+    except Exception as exc:  # pragma: no cover - depends on the torch build
+      logging.warning("INT8 quantization failed, keeping FP32 weights: %s", exc)
+
+
+if not USE_FALLBACK and USE_INT8 and DEVICE_TYPE == "cpu":
+  quantize_models(torch_models())
+
+if not USE_FALLBACK and USE_TORCH_COMPILE:
+  compile_models()
+
+if not USE_FALLBACK:
+  # Pay first-call setup (CLIP image preprocessing, kernel selection) at boot,
+  # before a preloading server forks, instead of on the first request
+  warm_up_models()
+
+
+class DiskEmbeddingStore:
+  """SQLite table of fp16 embeddings that survives process restarts.
+
+  Writes are queued and committed by a single background thread so request
+  threads never block on disk. Rows are keyed by a 128-bit BLAKE2b digest of
+  the cache key, so long thumbnail URLs don't bloat the primary-key index.
+  """
+
+  def __init__(self, path: str, table: str) -> None:
+    self._path = path
+    self._table = table
+    self._lock = threading.Lock()
+    self._pid: Optional[int] = None
+    self._reader: Optional[sqlite3.Connection] = None
+    self._writes: queue.Queue = queue.Queue()
+
+  def _connect(self) -> sqlite3.Connection:
+    connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+  def _ensure_open(self) -> None:
+    """Open the connection and writer thread in the current process.
+
+    This happens lazily, and again after a fork, so a preloading server
+    (gunicorn --preload) never hands its workers the parent's SQLite handle
+    or a writer thread that did not survive the fork.
+    """
+    if self._pid == os.getpid():
+      return
+    with self._lock:
+      if self._pid == os.getpid():
+        return
+      self._reader = self._connect()
+      self._reader.execute(f"CREATE TABLE IF NOT EXISTS {self._table} (key TEXT PRIMARY KEY, vec BLOB)")
+      self._writes = queue.Queue()
+      threading.Thread(
+        target=self._drain_writes, args=(self._writes,), name=f"{self._table}-writer", daemon=True
+      ).start()
+      self._pid = os.getpid()
+
+  @staticmethod
+  def _row_key(key: str) -> str:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+  def get(self, key: str) -> Optional[torch.Tensor]:
+    self._ensure_open()
+    with self._lock:
+      row = self._reader.execute(
+        f"SELECT vec FROM {self._table} WHERE key = ?", (self._row_key(key),)
+      ).fetchone()
+    if row is None:
+      return None
+    return torch.frombuffer(bytearray(row[0]), dtype=torch.float16)
+
+  def get_many(self, keys: List[str]) -> Dict[str, torch.Tensor]:
+    """Look up many keys with a few IN queries; missing keys are left out."""
+    self._ensure_open()
+    found: Dict[str, torch.Tensor] = {}
+    row_keys = {self._row_key(key): key for key in keys}
+    hashed = list(row_keys)
+    for start in range(0, len(hashed), 500):  # stay under SQLite's bound-parameter limit
+      chunk = hashed[start:start + 500]
+      placeholders = ",".join("?" * len(chunk))
+      with self._lock:
+        rows = self._reader.execute(
+          f"SELECT key, vec FROM {self._table} WHERE key IN ({placeholders})", chunk
+        ).fetchall()
+      for row_key, blob in rows:
+        found[row_keys[row_key]] = torch.frombuffer(bytearray(blob), dtype=torch.float16)
+    return found
+
+  def put(self, key: str, value: torch.Tensor) -> None:
+    self._ensure_open()
+    self._writes.put((self._row_key(key), value.detach().cpu().to(torch.float16).numpy().tobytes()))
+
+  def _drain_writes(self, writes: queue.Queue) -> None:
+    connection = self._connect()
+    while True:
+      batch = [writes.get()]
+      while not writes.empty():
+        batch.append(writes.get_nowait())
+      try:
+        connection.execute("BEGIN")
+        connection.executemany(f"INSERT OR REPLACE INTO {self._table} (key, vec) VALUES (?, ?)", batch)
+        connection.execute("COMMIT")
+      except sqlite3.Error as exc:
+        logging.warning("Failed to persist %d embeddings: %s", len(batch), exc)
+        if connection.in_transaction:
+          connection.execute("ROLLBACK")
+
+
+class EmbeddingCache:
+  """LRU cache of embeddings, shared by concurrent request threads.
+
+  When a DiskEmbeddingStore is attached, in-memory misses fall through to disk
+  and successful embeddings are written back to it.
+  """
+
+  def __init__(self, max_size: int, disk: Optional[DiskEmbeddingStore] = None) -> None:
     self._store: OrderedDict[str, Optional[torch.Tensor]] = OrderedDict()
     self._max_size = max_size
+    self._lock = threading.Lock()
+    self._disk = disk
 
   def get(self, key: str) -> Optional[torch.Tensor]:
-    if key in self._store:
-      self._store.move_to_end(key)
-      return self._store[key]
-    return None
+    with self._lock:
+      try:
+        # move_to_end raises KeyError on a miss, so a hit costs no extra membership test
+        self._store.move_to_end(key)
+        return self._store[key]
+      except KeyError:
+        pass
+    if self._disk is None:
+      return None
+    value = self._disk.get(key)
+    if value is not None:
+      self._remember(key, value)
+    return value
+
+  def get_many(self, keys: List[str]) -> Dict[str, torch.Tensor]:
+    """Return the cached embeddings for keys, checking disk once for all memory misses."""
+    found: Dict[str, torch.Tensor] = {}
+    with self._lock:
+      for key in keys:
+        value = self._store.get(key)
+        if value is not None:
+          self._store.move_to_end(key)
+          found[key] = value
+    missing = [key for key in keys if key not in found]
+    if self._disk is not None and missing:
+      from_disk = self._disk.get_many(missing)
+      for key, value in from_disk.items():
+        self._remember(key, value)
+      found.update(from_disk)
+    return found
 
   def set(self, key: str, value: Optional[torch.Tensor]) -> None:
-    self._store[key] = value
-    self._store.move_to_end(key)
-    if len(self._store) > self._max_size:
-      self._store.popitem(last=False)
+    self._remember(key, value)
+    if self._disk is not None and value is not None:
+      self._disk.put(key, value)
 
+  def _remember(self, key: str, value: Optional[torch.Tensor]) -> None:
+    with self._lock:
+      self._store[key] = value
+      self._store.move_to_end(key)
+      if len(self._store) > self._max_size:
+        self._store.popitem(last=False)
+
+
+image_cache = EmbeddingCache(
+  IMAGE_CACHE_MAX,
+  DiskEmbeddingStore(DISK_CACHE_PATH, "img_cache") if USE_DISK_CACHE and not USE_FALLBACK else None,
+)
+# Item-text embeddings keyed by model name and a hash of the text
+text_cache = EmbeddingCache(
+  TEXT_CACHE_MAX,
+  DiskEmbeddingStore(DISK_CACHE_PATH, "text_cache") if USE_DISK_CACHE and not USE_FALLBACK else None,
+)
+# One shared HTTP/2 client: thumbnails from the same host multiplex over a single
+# keep-alive connection instead of serializing on a small HTTP/1.1 pool.
+http = httpx.Client(
+  http2=True,
+  timeout=5.0,
+  follow_redirects=True,
+  limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+  headers={"User-Agent": "AISearch/1"},
+)
+atexit.register(http.close)
+image_fetch_executor = ThreadPoolExecutor(max_workers=IMAGE_FETCH_WORKERS, thread_name_prefix="thumbnail")
+
+
+class DecodeProcessPool:
+  """Process pool for thumbnail decoding, started on first use in each process.
+
+  Like DiskEmbeddingStore, the pool is created again after a fork: a
+  preloading server (gunicorn --preload) must not hand its workers the
+  parent's call and result queues, or they end up reading each other's
+  results.
+  """
 
-image_cache = ImageEmbeddingCache(IMAGE_CACHE_MAX)
-http = requests.Session()
+  def __init__(self, max_workers: int) -> None:
+    self._max_workers = max_workers
+    self._lock = threading.Lock()
+    self._pid: Optional[int] = None
+    self._executor: Optional[ProcessPoolExecutor] = None
 
-# Negative keyword classifier (trained from user feedback)
+  def _ensure_open(self) -> ProcessPoolExecutor:
+    if self._pid != os.getpid():
+      with self._lock:
+        if self._pid != os.getpid():
+          self._executor = ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+          )
+          self._pid = os.getpid()
+    return self._executor
+
+  def decode(self, blob: bytes) -> np.ndarray:
+    return self._ensure_open().submit(decode_thumbnail, blob).result(timeout=DECODE_TIMEOUT)
+
+
+image_decode_pool = DecodeProcessPool(DECODE_PROCESSES) if DECODE_PROCESSES > 0 else None
+
+# Negative keyword classifier, updated online from user feedback. The hashing
+# vectorizer is stateless, so only the classifier and the feedback already
+# learned from need to be kept (and persisted) between calls.
 negative_classifier = None
-negative_vectorizer = None
+negative_vectorizer = (
+  HashingVectorizer(n_features=2**18, ngram_range=(1, 2), stop_words='english', alternate_sign=False)
+  if HashingVectorizer else None
+)
+negative_term_counts: Counter = Counter()  # "down" minus "up" occurrences per term
+# Digests of (text, label) pairs already passed to partial_fit, oldest first
+learned_feedback: OrderedDict[bytes, None] = OrderedDict()
 learned_negative_keywords: List[str] = []
+negative_training_lock = threading.Lock()
 
-# Query embedding cache: store recent query embeddings to speed up repeated searches
-class EmbeddingCache:
-  def __init__(self, max_size: int = 256) -> None:
-    self._store: OrderedDict[str, torch.Tensor] = OrderedDict()
+
+def feedback_key(text: str, label: int) -> bytes:
+  """Compact digest identifying one feedback sample."""
+  return hashlib.blake2b(f"{label}:{text}".encode("utf-8"), digest_size=16).digest()
+
+
+def save_negative_classifier() -> None:
+  """Persist the classifier state atomically.
+
+  The state is written to a temp file beside NEGATIVE_MODEL_PATH and renamed
+  over it, so a crash or a concurrent writer in another worker never leaves a
+  torn file for the next boot to load.
+  """
+  directory = os.path.dirname(os.path.abspath(NEGATIVE_MODEL_PATH))
+  fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+  try:
+    with os.fdopen(fd, "wb") as f:
+      joblib.dump(
+        {
+          "classifier": negative_classifier,
+          "term_counts": negative_term_counts,
+          "learned_feedback": list(learned_feedback),
+        },
+        f,
+      )
+    os.replace(temp_path, NEGATIVE_MODEL_PATH)
+  except BaseException:
+    with contextlib.suppress(OSError):
+      os.remove(temp_path)
+    raise
+
+
+def load_negative_classifier() -> None:
+  """Restore the feedback classifier saved by a previous run, if any."""
+  global negative_classifier, negative_term_counts, learned_feedback, learned_negative_keywords
+  try:
+    state = joblib.load(NEGATIVE_MODEL_PATH)
+  except FileNotFoundError:
+    return
+  except Exception as e:
+    logging.warning(f"Failed to load negative classifier: {e}")
+    return
+  negative_classifier = state["classifier"]
+  negative_term_counts = state["term_counts"]
+  learned_feedback = OrderedDict.fromkeys(state["learned_feedback"])
+  learned_negative_keywords = [term for term, count in negative_term_counts.most_common(30) if count > 0]
+
+
+if not USE_FALLBACK and joblib is not None:
+  load_negative_classifier()
+
+# Query embedding caches: repeated searches reuse the encoded query instead of
+# running the transformer again. lru_cache is thread-safe for concurrent requests.
+QUERY_EMBEDDING_CACHE_MAX = 1024
+# Reuse the secondary/CLIP query embeddings of an earlier near-duplicate query
+# (primary-model cosine >= SEMANTIC_QUERY_THRESHOLD) instead of encoding again
+USE_SEMANTIC_QUERY_CACHE = os.environ.get("AIS_SEMANTIC_QUERY_CACHE", "0") == "1"
+SEMANTIC_QUERY_THRESHOLD = 0.97
+
+
+@functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_MAX)
+def encode_query_text(query: str) -> torch.Tensor:
+  """Encode a query string with the primary text model."""
+  return encode(model, query)
+
+
+@functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_MAX)
+def encode_query_secondary(query: str) -> torch.Tensor:
+  """Encode a query string with the secondary ensemble model."""
+  return encode(secondary_model, query)
+
+
+# CLIP text embeddings for the fixed expansion and visual-validation vocabulary,
+# encoded in one batch at startup so those strings never hit the text tower per request
+CLIP_VOCABULARY_EMBEDDINGS: Dict[str, torch.Tensor] = {}
+
+
+@functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_MAX)
+def encode_query_clip(query: str) -> torch.Tensor:
+  """Encode a query string with the CLIP text tower for image matching."""
+  embedding = CLIP_VOCABULARY_EMBEDDINGS.get(query)
+  if embedding is not None:
+    return embedding
+  return encode(clip_model, query)
+
+
+def precompute_clip_vocabulary() -> None:
+  """Encode every query expansion and visual-validation keyword with CLIP."""
+  vocabulary = set(QUERY_EXPANSIONS)
+  vocabulary.update(variant for variants in QUERY_EXPANSIONS.values() for variant in variants)
+  vocabulary.update(keyword for keywords in VISUAL_VALIDATION_KEYWORDS.values() for keyword in keywords)
+  vocabulary = sorted(vocabulary)
+  CLIP_VOCABULARY_EMBEDDINGS.update(zip(vocabulary, encode(clip_model, vocabulary)))
+
+
+if not USE_FALLBACK and clip_model is not None:
+  precompute_clip_vocabulary()
+
+
+class SemanticQueryIndex:
+  """Maps each query to an earlier near-duplicate query, if there is one.
+
+  Queries are compared by their primary-model embedding, which /search
+  computes anyway, so a hit saves the secondary and CLIP text encodes. The
+  embeddings live in one preallocated matrix that is overwritten round-robin.
+  """
+
+  def __init__(self, max_size: int, threshold: float) -> None:
     self._max_size = max_size
+    self._threshold = threshold
+    self._lock = threading.Lock()
+    self._embeddings: Optional[torch.Tensor] = None
+    self._queries: List[str] = []
+    self._next = 0
+
+  def canonical(self, query: str, embedding: torch.Tensor) -> str:
+    with self._lock:
+      if self._queries:
+        similarities = self._embeddings[:len(self._queries)] @ embedding
+        best = int(torch.argmax(similarities))
+        if similarities[best] >= self._threshold:
+          return self._queries[best]
+      if self._embeddings is None:
+        self._embeddings = torch.zeros((self._max_size, embedding.shape[-1]), device=embedding.device)
+      self._embeddings[self._next] = embedding
+      if len(self._queries) < self._max_size:
+        self._queries.append(query)
+      else:
+        self._queries[self._next] = query
+      self._next = (self._next + 1) % self._max_size
+      return query
 
-  def get(self, key: str) -> Optional[torch.Tensor]:
-    if key in self._store:
-      self._store.move_to_end(key)
-      return self._store[key]
-    return None
 
-  def set(self, key: str, value: torch.Tensor) -> None:
-    if key in self._store:
-      del self._store[key]
-    self._store[key] = value
-    self._store.move_to_end(key)
-    if len(self._store) > self._max_size:
-      self._store.popitem(last=False)
+semantic_query_index = (
+  SemanticQueryIndex(QUERY_EMBEDDING_CACHE_MAX, SEMANTIC_QUERY_THRESHOLD)
+  if USE_SEMANTIC_QUERY_CACHE and not USE_FALLBACK else None
+)
+
 
-  def clear(self) -> None:
-    self._store.clear()
+def semantic_query_key(query: str) -> str:
+  """Query string to use for the secondary and CLIP embedding caches."""
+  if semantic_query_index is None:
+    return query
+  return semantic_query_index.canonical(query, encode_query_text(query))
 
-query_embedding_cache = EmbeddingCache(max_size=256)
+
+def encode_texts_cached(st_model: Any, model_name: str, texts: List[str]) -> torch.Tensor:
+  """Encode item texts, reusing embeddings already cached for identical text.
+
+  Only the distinct texts missing from the cache go through the model, in one
+  batched call. Embeddings are cached as fp16 and returned upcast to float32
+  on the model's device.
+  """
+  keys = [f"{model_name}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}" for text in texts]
+  cached = text_cache.get_many(keys)
+  misses = {key: text for key, text in zip(keys, texts) if key not in cached}
+  if misses:
+    fresh = encode(st_model, list(misses.values()), batch_size=TEXT_ENCODE_BATCH_SIZE)
+    for key, embedding in zip(misses, fresh):
+      # Compact fp16 copy (it also stops a cached row pinning the whole batch).
+      # Memory and disk hits then score exactly like a fresh encode.
+      embedding = embedding.to(torch.float16)
+      text_cache.set(key, embedding)
+      cached[key] = embedding
+  return torch.stack([cached[key].to(st_model.device, torch.float32) for key in keys])
 
 
 def detect_query_intent(query: str) -> str:
   """Detect user's intent from query to adjust scoring."""
-  query_lower = query.lower()
+  counts = count_keyword_groups(query.lower(), INTENT_GROUPS)
   
-  # Count keyword matches for each intent
-  intent_scores = {intent: 0 for intent in INTENT_KEYWORDS}
-  for intent, keywords in INTENT_KEYWORDS.items():
-    intent_scores[intent] = sum(1 for kw in keywords if kw in query_lower)
-  
-  # Return the intent with most matches, default to "factual"
-  best_intent = max(intent_scores.items(), key=lambda x: x[1])
-  return best_intent[0] if best_intent[1] > 0 else "factual"
+  # The intent with most matches wins (first listed on ties), default "factual"
+  best_intent, best_count = "factual", 0
+  for (_, intent), count in counts.items():
+    if count > best_count:
+      best_intent, best_count = intent, count
+  return best_intent
 
 
 def detect_recency(metadata: str) -> float:
   """Detect content recency from metadata and return boost multiplier."""
   metadata_lower = metadata.lower()
   
-  # Check for very recent content (boost heavily)
-  if any(kw in metadata_lower for kw in RECENCY_KEYWORDS.get("very_recent", [])):
-    return 1.5  # 50% boost for content from today/hours ago
-  
-  # Check for recent content (moderate boost)
-  if any(kw in metadata_lower for kw in RECENCY_KEYWORDS.get("recent", [])):
-    return 1.3  # 30% boost for week-old content
-  
-  # Check for somewhat recent (slight boost)
-  if any(kw in metadata_lower for kw in RECENCY_KEYWORDS.get("somewhat_recent", [])):
-    return 1.1  # 10% boost for month-old content
+  # Very recent content gets the biggest boost, so check buckets in order
+  if KEYWORD_AUTOMATON is None:
+    # Substring fallback: stop at the first bucket with a hit
+    for group, boost in RECENCY_BOOSTS:
+      if any(kw in metadata_lower for kw in KEYWORD_GROUPS[group]):
+        return boost
+    return 1.0
+  counts = count_keyword_groups(metadata_lower, [group for group, _ in RECENCY_BOOSTS])
+  for group, boost in RECENCY_BOOSTS:
+    if counts[group]:
+      return boost
   
   # Default: no boost for older content
   return 1.0
 
 
-def detect_topics(text: str) -> List[str]:
-  """Detect semantic topics/entities in text using keyword matching."""
-  text_lower = text.lower()
-  detected = []
-  
-  for category, keywords in TOPIC_CATEGORIES.items():
-    if any(kw in text_lower for kw in keywords):
-      detected.append(category)
-  
-  return detected
+class ItemFeatures(NamedTuple):
+  """Keyword signals for one /search item, gathered in a single pre-pass."""
+  content_lower: str
+  topics: List[str]
+  recency: float
+  keyword_counts: Dict[KeywordGroup, int]
+
+
+def extract_item_features(content_lower: str, metadata: str, keyword_groups: List[KeywordGroup]) -> ItemFeatures:
+  """Scan an item's lowercased content once for topics and the requested keyword groups."""
+  counts = count_keyword_groups(content_lower, keyword_groups + TOPIC_GROUPS)
+  topics = [group[1] for group in TOPIC_GROUPS if counts[group]]
+  return ItemFeatures(content_lower, topics, detect_recency(metadata), counts)
 
 
 def apply_topic_filtering(score: float, content_topics: List[str], query_intent: str) -> float:
@@ -361,75 +990,111 @@ def apply_topic_filtering(score: float, content_topics: List[str], query_intent:
   return score
 
 
+def apply_capped_boost(scores: np.ndarray, boosts: np.ndarray) -> np.ndarray:
+  """Multiply scores by per-item boosts capped at 1.0. A boost of 1.0 leaves the score untouched."""
+  return np.where(boosts != 1.0, np.minimum(scores * boosts, 1.0), scores)
+
+
 def train_negative_classifier(feedback_data: List[Dict[str, Any]]) -> None:
-  """Train classifier on user feedback to identify negative patterns."""
-  global negative_classifier, negative_vectorizer, learned_negative_keywords
+  """Update the classifier with feedback it has not learned from yet."""
+  global negative_classifier, learned_negative_keywords
   
-  if USE_FALLBACK or not TfidfVectorizer or not LogisticRegression:
+  if USE_FALLBACK or not negative_vectorizer or not SGDClassifier:
     return
   
   if len(feedback_data) < 10:  # Need minimum data to train
     return
   
-  # Extract texts and labels (1 = good, 0 = bad)
-  texts = [item.get('title', '') + ' ' + item.get('description', '') for item in feedback_data]
-  labels = [1 if item.get('feedback') == 'up' else 0 for item in feedback_data]
-  
-  # Balance check: need both positive and negative examples
-  if sum(labels) == 0 or sum(labels) == len(labels):
-    return
-  
-  try:
-    # Train TF-IDF vectorizer and logistic regression
-    negative_vectorizer = TfidfVectorizer(max_features=200, ngram_range=(1, 2), stop_words='english')
-    X = negative_vectorizer.fit_transform(texts)
-    
-    negative_classifier = LogisticRegression(max_iter=500, random_state=42)
-    negative_classifier.fit(X, labels)
+  with negative_training_lock:
+    # The extension resends its whole feedback log; only new entries are learned.
+    # Samples are (text, label) with 1 = good, 0 = bad.
+    samples = (
+      ((item.get('title') or '') + ' ' + (item.get('description') or ''), 1 if item.get('feedback') == 'up' else 0)
+      for item in feedback_data
+    )
+    keyed = {feedback_key(text, label): (text, label) for text, label in samples}
+    new_keys = [key for key in keyed if key not in learned_feedback]
+    new_samples = [keyed[key] for key in new_keys]
+    if not new_samples:
+      return
+    texts = [text for text, _ in new_samples]
+    labels = [label for _, label in new_samples]
     
-    # Extract top negative keywords (high coefficient for class 0)
-    feature_names = negative_vectorizer.get_feature_names_out()
-    coefs = negative_classifier.coef_[0]
-    negative_indices = coefs.argsort()[:30]  # Top 30 negative indicators
-    learned_negative_keywords = [feature_names[i] for i in negative_indices]
+    # The first fit needs both positive and negative examples
+    if negative_classifier is None and len(set(labels)) < 2:
+      return
     
-    logging.info(f"Trained negative classifier on {len(feedback_data)} samples. Top negative keywords: {learned_negative_keywords[:10]}")
-  except Exception as e:
-    logging.warning(f"Failed to train negative classifier: {e}")
+    try:
+      X = negative_vectorizer.transform(texts)
+      # Update a copy so concurrent /search requests keep a consistent model
+      classifier = (
+        copy.deepcopy(negative_classifier) if negative_classifier is not None
+        else SGDClassifier(loss='log_loss', random_state=42)
+      )
+      for _ in range(NEGATIVE_TRAIN_EPOCHS):
+        classifier.partial_fit(X, labels, classes=[0, 1])
+      negative_classifier = classifier
+      learned_feedback.update(dict.fromkeys(new_keys))
+      while len(learned_feedback) > LEARNED_FEEDBACK_MAX:
+        learned_feedback.popitem(last=False)
+      
+      # Terms seen more in "down" than "up" feedback become the learned keywords
+      analyze = negative_vectorizer.build_analyzer()
+      for text, label in new_samples:
+        terms = list(dict.fromkeys(analyze(text)))  # distinct terms, in a stable order
+        if label == 0:
+          negative_term_counts.update(terms)
+        else:
+          negative_term_counts.subtract(terms)
+      learned_negative_keywords = [term for term, count in negative_term_counts.most_common(30) if count > 0]
+      
+      save_negative_classifier()
+      logging.info(f"Updated negative classifier with {len(new_samples)} new samples. Top negative keywords: {learned_negative_keywords[:10]}")
+    except Exception as e:
+      logging.warning(f"Failed to train negative classifier: {e}")
 
 
-def predict_negative_score(text: str) -> float:
-  """Predict probability that content is 'bad' based on learned patterns. Returns 0-1."""
-  if not negative_classifier or not negative_vectorizer:
-    return 0.0
+def predict_negative_scores(texts: List[str]) -> np.ndarray:
+  """Predict, for each text, the probability that it is 'bad' content (0-1)."""
+  classifier = negative_classifier
+  if not classifier or not negative_vectorizer:
+    return np.zeros(len(texts))
   
   try:
-    X = negative_vectorizer.transform([text])
-    prob_negative = negative_classifier.predict_proba(X)[0][0]  # Probability of class 0 (bad)
-    return float(prob_negative)
+    X = negative_vectorizer.transform(texts)
+    return classifier.predict_proba(X)[:, 0]  # Probability of class 0 (bad)
   except Exception:
-    return 0.0
+    return np.zeros(len(texts))
+
 
+def visual_validation_query(query_lower: str) -> Optional[str]:
+  """The query family with clear visual expectations ("apple" or "flower"), if any."""
+  if "apple" in query_lower:
+    return "apple"
+  if "flower" in query_lower:
+    return "flower"
+  return None
 
-def validate_image_text_consistency(title: str, description: str, image_url: str, query: str) -> float:
+
+def validate_image_text_consistency(content_text: str, embedding: Optional[torch.Tensor], query: str) -> float:
   """
   Use CLIP to detect when image contradicts text content.
+  content_text is the item's lowercased "title description" and embedding its
+  thumbnail's CLIP embedding.
   Returns penalty multiplier: 1.0 (no penalty) to 0.1 (strong penalty).
   """
-  if USE_FALLBACK or not clip_model or not image_url:
+  if USE_FALLBACK or not clip_model or embedding is None:
     return 1.0
   
-  query_lower = query.lower()
-  content_text = f"{title} {description}".lower()
-  
   # Only validate for queries where we have clear visual expectations
+  visual_query = visual_validation_query(query.lower())
   validation_category = None
-  if "apple" in query_lower:
+  if visual_query == "apple":
     if any(kw in content_text for kw in ["fruit", "nutrition", "healthy", "organic", "orchard"]):
       validation_category = "apple_fruit"
     elif any(kw in content_text for kw in ["iphone", "mac", "ios", "tech", "device"]):
       validation_category = "apple_tech"
-  elif "flower" in query_lower:
+  elif visual_query == "flower":
     validation_category = "flower"
   
   if not validation_category:
@@ -439,15 +1104,14 @@ def validate_image_text_consistency(title: str, description: str, image_url: str
     # Get expected visual keywords for this category
     expected_visuals = VISUAL_VALIDATION_KEYWORDS.get(validation_category, [])
     
-    # Use CLIP to score image against expected visual concepts
-    clip_scores = []
-    for visual_keyword in expected_visuals[:3]:  # Check top 3 keywords
-      score = compute_image_score(image_url, clip_model.encode([visual_keyword], convert_to_tensor=True)[0])
-      if score is not None:
-        clip_scores.append(score)
-    
-    if not clip_scores:
+    # Score the thumbnail embedding against the top 3 expected visual
+    # concepts in one matmul
+    if not expected_visuals:
       return 1.0
+    keyword_embeddings = torch.stack([encode_query_clip(keyword) for keyword in expected_visuals[:3]])
+    with torch.inference_mode():
+      similarities = keyword_embeddings @ embedding.to(keyword_embeddings.device, torch.float32)
+      clip_scores = ((similarities + 1.0) * 0.5).clamp_(0.0, 1.0).cpu().tolist()
     
     avg_visual_match = sum(clip_scores) / len(clip_scores)
     
@@ -465,14 +1129,39 @@ def validate_image_text_consistency(title: str, description: str, image_url: str
 
 
 
+def read_json_payload() -> Any:
+  """Parse the request body as JSON, returning {} for empty or malformed bodies."""
+  if orjson is None:
+    return request.get_json(force=True, silent=True) or {}
+  body = request.get_data()
+  if not body:
+    return {}
+  try:
+    return orjson.loads(body) or {}
+  except orjson.JSONDecodeError:
+    return {}
+
+
+def json_response(payload: Any) -> Any:
+  """Serialize a response body with orjson when available, else Flask's jsonify."""
+  if orjson is None:
+    return jsonify(payload)
+  return app.response_class(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), mimetype="application/json")
+
+
+# CORS headers that never change between responses; only the origin is echoed per request
+STATIC_CORS_HEADERS = (
+  ("Access-Control-Allow-Credentials", "true"),
+  ("Access-Control-Allow-Headers", "Content-Type, Accept"),
+  ("Access-Control-Allow-Methods", "POST, OPTIONS"),
+  ("Vary", "Origin"),
+)
+
+
 @app.after_request
 def add_cors_headers(response: Any) -> Any:
-  origin = request.headers.get("Origin", "*")
-  response.headers["Access-Control-Allow-Origin"] = origin
-  response.headers["Access-Control-Allow-Credentials"] = "true"
-  response.headers["Access-Control-Allow-Headers"] = "Content-Type, Accept"
-  response.headers["Access-Control-Allow-Methods"] = "POST, OPTIONS"
-  response.headers.setdefault("Vary", "Origin")
+  response.headers["Access-Control-Allow-Origin"] = request.headers.get("Origin") or "*"
+  response.headers.extend(STATIC_CORS_HEADERS)
   return response
 
 
@@ -488,7 +1177,7 @@ def match_tags() -> Any:
     preflight = app.make_response(("", 204))
     return preflight
   
-  payload = request.get_json(force=True, silent=True) or {}
+  payload = read_json_payload()
   tags = payload.get("tags", [])
   videos = payload.get("videos", [])
   min_score = payload.get("minScore", 70) / 100.0  # Convert percentage to 0-1
@@ -506,8 +1195,8 @@ def match_tags() -> Any:
   if blocklist:
     logging.info(f"Blocklist active ({len(blocklist)} patterns): {blocklist[:5]}...")
   
-  matches = []
-  
+  candidates = []  # (video, title, video_text) for videos that survive the filters
+
   for video in videos:
     try:
       # Extract title first (always needed)
@@ -519,9 +1208,9 @@ def match_tags() -> Any:
         video_text = video['text'].lower()
       else:
         # Or build from individual fields
-        description = video.get('description', '')
-        metadata = video.get('metadata', '')
-        video_text = f"{title} {description} {metadata}".lower()
+        description = video.get('description') or ''
+        metadata = video.get('metadata') or ''
+        video_text = " ".join((title, description, metadata)).lower()
       
       # Skip if no text
       if not video_text.strip():
@@ -594,6 +1283,46 @@ def match_tags() -> Any:
           logging.debug(f"Skipping religious/person content: {title}")
           continue
       
+      candidates.append((video, title, video_text))
+    
+    except Exception as e:
+      logging.warning(f"Error matching video {video.get('id')}: {e}")
+      continue
+  
+  # Semantic scores for every surviving video at once: each side is encoded in
+  # one batch, then one matmul and one .tolist() per score matrix
+  tag_similarities = None  # [tag][video]
+  overall_similarities = None  # [video]
+  image_similarities = None  # [video]
+  if not USE_FALLBACK and candidates:
+    tags_text = " ".join(tags).lower()
+    try:
+      video_embeddings = encode_texts_cached(model, MODEL_NAME, [text for _, _, text in candidates])
+      tag_embeddings = encode(model, [tag.lower() for tag in tags])
+      tag_similarities = (tag_embeddings @ video_embeddings.T).cpu().tolist()
+      overall_similarities = (encode_query_text(tags_text) @ video_embeddings.T).cpu().tolist()
+    except Exception as e:
+      logging.warning(f"Failed to score videos against tags: {e}")
+    
+    # Image matching for videos with a thumbnail (raw CLIP cosine similarity)
+    if clip_model is not None:
+      try:
+        thumbnail_embeddings = fetch_image_embeddings([video.get('thumbnail') or '' for video, _, _ in candidates])
+        valid = [index for index, embedding in enumerate(thumbnail_embeddings) if embedding is not None]
+        image_similarities = [0.0] * len(candidates)
+        if valid:
+          clip_tags_embedding = encode_query_clip(tags_text)
+          with torch.inference_mode():
+            stacked = torch.stack([thumbnail_embeddings[index].to(clip_tags_embedding.device) for index in valid]).float()
+            for index, similarity in zip(valid, (stacked @ clip_tags_embedding).cpu().tolist()):
+              image_similarities[index] = similarity
+      except Exception as img_err:
+        logging.debug(f"Image matching failed: {img_err}")
+  
+  matches = []
+  
+  for position, (video, title, video_text) in enumerate(candidates):
+    try:
       # Calculate semantic similarity between tags and video
       text_score = 0.0
       image_score = 0.0
@@ -616,7 +1345,7 @@ def match_tags() -> Any:
         max_tag_score = 0.0
         tag_scores = {}  # Track each tag's score for debugging
         
-        for tag in tags:
+        for tag_index, tag in enumerate(tags):
           tag_lower = tag.lower()
           
           # CONTEXT VALIDATION: Check if tag appears in a person's name vs actual content
@@ -653,21 +1382,15 @@ def match_tags() -> Any:
             matched_tags.append(tag)
             max_tag_score = max(max_tag_score, 0.8)
             tag_scores[tag] = 0.8
-          else:
+          elif tag_similarities is not None:
             # Semantic similarity check
-            try:
-              tag_emb = primary_model.encode(tag_lower, convert_to_tensor=True)
-              video_emb = primary_model.encode(video_text, convert_to_tensor=True)
-              tag_sim = util.pytorch_cos_sim(tag_emb, video_emb)
-              similarity = float(tag_sim[0][0])
-              tag_scores[tag] = similarity
-              
-              # Lower threshold for tag matching - 0.15 instead of 0.25 (even more lenient)
-              if similarity > 0.15:
-                matched_tags.append(tag)
-                max_tag_score = max(max_tag_score, similarity)
-            except Exception as e:
-              logging.debug(f"Error encoding tag {tag}: {e}")
+            similarity = tag_similarities[tag_index][position]
+            tag_scores[tag] = similarity
+            
+            # Lower threshold for tag matching - 0.15 instead of 0.25 (even more lenient)
+            if similarity > 0.15:
+              matched_tags.append(tag)
+              max_tag_score = max(max_tag_score, similarity)
         
         # Log tag scores for debugging
         if tag_scores:
@@ -676,39 +1399,12 @@ def match_tags() -> Any:
         
         text_score = max_tag_score
         
-        # Also try overall semantic similarity
-        try:
-          tags_text = " ".join(tags).lower()
-          tags_embedding = primary_model.encode(tags_text, convert_to_tensor=True)
-          video_embedding = primary_model.encode(video_text, convert_to_tensor=True)
-          overall_similarity = util.pytorch_cos_sim(tags_embedding, video_embedding)
-          overall_score = float(overall_similarity[0][0])
-          
-          # Use the better of individual tag matching or overall matching
-          text_score = max(text_score, overall_score)
-        except Exception as e:
-          logging.debug(f"Error in overall similarity: {e}")
+        # Use the better of individual tag matching or overall matching
+        if overall_similarities is not None:
+          text_score = max(text_score, overall_similarities[position])
         
-        # Try image matching if thumbnail available
-        thumbnail_url = video.get('thumbnail', '')
-        if thumbnail_url and clip_model and clip_processor:
-          try:
-            image_embedding = get_image_embedding_cached(thumbnail_url)
-            if image_embedding is not None:
-              tags_text = " ".join(tags).lower()
-              clip_tags_input = clip_processor(text=[tags_text], return_tensors="pt", padding=True, truncation=True)
-              with torch.no_grad():
-                clip_tags_embedding = clip_model.get_text_features(**clip_tags_input)
-                clip_tags_embedding /= clip_tags_embedding.norm(dim=-1, keepdim=True)
-              
-              image_similarity = torch.nn.functional.cosine_similarity(
-                clip_tags_embedding,
-                image_embedding,
-                dim=1
-              )
-              image_score = float(image_similarity[0])
-          except Exception as img_err:
-            logging.debug(f"Image matching failed: {img_err}")
+        if image_similarities is not None:
+          image_score = image_similarities[position]
       
       # Combine text and image scores (prioritize text for tag matching)
       combined_score = (text_score * 0.7) + (image_score * 0.3)
@@ -737,7 +1433,7 @@ def match_tags() -> Any:
   
   logging.info(f"Found {len(matches)} / {len(videos)} videos matching tags (min score: {min_score * 100}%)")
   
-  return jsonify({
+  return json_response({
     "matches": matches,
     "total_analyzed": len(videos),
     "total_matched": len(matches)
@@ -751,7 +1447,7 @@ def feedback() -> Any:
     preflight = app.make_response(("", 204))
     return preflight
   
-  payload = request.get_json(force=True, silent=True) or {}
+  payload = read_json_payload()
   feedback_data = payload.get("feedback_data") or []
   
   if not feedback_data:
@@ -762,7 +1458,7 @@ def feedback() -> Any:
   # Train classifier on new feedback
   train_negative_classifier(feedback_data)
   
-  return jsonify({
+  return json_response({
     "status": "ok",
     "samples": len(feedback_data),
     "learned_keywords": learned_negative_keywords[:10]
@@ -774,7 +1470,7 @@ def search() -> Any:
   if request.method == "OPTIONS":
     preflight = app.make_response(("", 204))
     return preflight
-  payload = request.get_json(force=True, silent=True) or {}
+  payload = read_json_payload()
   query = (payload.get("query") or "").strip()
   items: List[Dict[str, Any]] = payload.get("items") or []
   feedback_history = payload.get("feedback") or {"positive": [], "negative": []}
@@ -800,11 +1496,14 @@ def search() -> Any:
     descriptions.append(item.get("description") or "")
     thumbnails.append(item.get("thumbnail") or "")
     metadata_list.append(item.get("metadata") or "")
+  # Lowercased "title description", shared by every keyword rule
+  contents_lower = [" ".join(fields).lower() for fields in zip(titles, descriptions)]
 
   if not texts:
     response = jsonify({"error": "No valid text items"})
     response.status_code = 400
     return response
+  top_k = payload.get("top_k")
 
   # Query expansion: for ambiguous queries, also score against expanded variants
   query_lower = query.lower()
@@ -814,330 +1513,345 @@ def search() -> Any:
 
   # Compute text similarities. Use the sentence-transformers model when
   # available, otherwise fall back to a lightweight token-overlap scorer.
-  if model is not None and util is not None and torch is not None:
+  if model is not None and torch is not None:
     # Encode all query variants with caching to speed up repeated searches
-    query_embeddings = []
-    for q in expansion_queries:
-      cached = query_embedding_cache.get(q)
-      if cached is not None:
-        query_embeddings.append(cached)
-      else:
-        emb = model.encode(q, convert_to_tensor=True, normalize_embeddings=True)
-        query_embedding_cache.set(q, emb)
-        query_embeddings.append(emb)
-
-    item_embeddings = model.encode(texts, convert_to_tensor=True, normalize_embeddings=True)
-    # For each item, find max similarity across all query variants
-    similarities = []
-    for item_emb in item_embeddings:
-      max_sim = max(
-        util.cos_sim(qe, item_emb.unsqueeze(0))[0][0].item()
-        for qe in query_embeddings
-      )
-      similarities.append(max_sim)
+    query_embeddings = torch.stack([encode_query_text(q) for q in expansion_queries])
+
+    # One batched encode for every uncached item, then a [Q, N] similarity matrix
+    # (embeddings are unit-norm, so the dot product is the cosine);
+    # each item keeps its best score across the query variants
+    item_embeddings = encode_texts_cached(model, MODEL_NAME, texts)
+    text_arr = (query_embeddings @ item_embeddings.T).max(dim=0).values.cpu().numpy().astype(np.float64)
     
     # Multi-model ensemble: also score with secondary model if available
     if USE_ENSEMBLE and secondary_model is not None:
-      secondary_embeddings = secondary_model.encode(texts, convert_to_tensor=True, normalize_embeddings=True)
+      secondary_embeddings = encode_texts_cached(secondary_model, SECONDARY_MODEL_NAME, texts)
       # Encode queries with secondary model (must match dimensions)
-      secondary_query_embeddings = [
-        secondary_model.encode(q, convert_to_tensor=True, normalize_embeddings=True)
-        for q in expansion_queries
-      ]
-      secondary_similarities = []
-      for item_emb in secondary_embeddings:
-        max_sim = max(
-          util.cos_sim(qe, item_emb.unsqueeze(0))[0][0].item()
-          for qe in secondary_query_embeddings  # Use secondary model embeddings
-        )
-        secondary_similarities.append(max_sim)
+      secondary_query_embeddings = torch.stack([encode_query_secondary(semantic_query_key(q)) for q in expansion_queries])
+      secondary_arr = (secondary_query_embeddings @ secondary_embeddings.T).max(dim=0).values.cpu().numpy()
       # Weighted ensemble: 60% primary, 40% secondary
-      similarities = [
-        primary * ENSEMBLE_WEIGHTS[0] + secondary * ENSEMBLE_WEIGHTS[1]
-        for primary, secondary in zip(similarities, secondary_similarities)
-      ]
+      text_arr = text_arr * ENSEMBLE_WEIGHTS[0] + secondary_arr.astype(np.float64) * ENSEMBLE_WEIGHTS[1]
     
-    similarities = similarities
+    clip_queries = torch.stack([encode_query_clip(semantic_query_key(q)) for q in expansion_queries])
 
-    clip_queries = clip_model.encode(
-      expansion_queries,
-      convert_to_tensor=True,
-      normalize_embeddings=True,
-      show_progress_bar=False,
-    )
+    # Only items passing the text gate get image scoring; the rest keep their
+    # text score. If too few pass to fill top_k, score every thumbnail.
+    candidate_thumbnails = [
+      thumbnail if passes else ""
+      for thumbnail, passes in zip(thumbnails, (text_arr >= TEXT_GATE).tolist())
+    ]
+    if isinstance(top_k, int) and sum(1 for t in candidate_thumbnails if t) < top_k:
+      candidate_thumbnails = thumbnails
 
-    image_scores: List[Optional[float]] = []
-    for thumbnail in thumbnails:
-      image_scores.append(compute_image_score_expanded(thumbnail, clip_queries))
+    # Download all uncached thumbnails concurrently and encode them in one batch
+    thumbnail_embeddings = fetch_image_embeddings(candidate_thumbnails)
+    image_arr = score_image_embeddings(thumbnail_embeddings, clip_queries)
   else:
-    # Fallback: simple token-overlap similarity in [0,1]
-    def simple_score(a: str, b: str) -> float:
-      sa = {t for t in a.lower().split() if t}
-      sb = {t for t in b.lower().split() if t}
-      if not sa or not sb:
-        return 0.0
-      inter = sa.intersection(sb)
-      union = sa.union(sb)
-      return float(len(inter)) / float(len(union))
+    # Fallback: simple token-overlap (Jaccard) similarity in [0,1]. Token sets
+    # are built once per query variant and per item, not once per pair.
+    query_token_sets = [frozenset(q.lower().split()) for q in expansion_queries]
+    item_token_sets = [frozenset(t.lower().split()) for t in texts]
 
     # For fallback, score against all expansion variants and take max
-    similarities = [
-      max(simple_score(q, t) for q in expansion_queries)
-      for t in texts
-    ]
-    image_scores = [None for _ in thumbnails]
+    text_arr = np.array([
+      max(
+        len(query_tokens & item_tokens) / len(query_tokens | item_tokens)
+        if query_tokens and item_tokens else 0.0
+        for query_tokens in query_token_sets
+      )
+      for item_tokens in item_token_sets
+    ])
+    thumbnail_embeddings = [None] * len(texts)
+    image_arr = np.full(len(texts), np.nan)
 
-  combined_scores: List[float] = []
-  for text_score, image_score in zip(similarities, image_scores):
-    if image_score is None:
-      combined_scores.append(text_score)
-    else:
-      combined_scores.append((text_score * TEXT_WEIGHT) + (image_score * IMAGE_WEIGHT))
+  # Scores stay in float64 arrays (NaN = no image score) so every rule below
+  # runs as one whole-array NumPy stage; the stages are order-sensitive
+  # because of the caps.
+  has_image = ~np.isnan(image_arr)
+  combined = np.where(~has_image, text_arr, (text_arr * TEXT_WEIGHT) + (image_arr * IMAGE_WEIGHT))
 
   # Apply semantic disambiguation: aggressive filtering and boosting for accuracy
-  adjusted_scores: List[float] = []
   query_lower = query.lower()
   
   # Detect query intent to adjust scoring
   detected_intent = detect_query_intent(query_lower)
   intent_weight = INTENT_WEIGHTS.get(detected_intent, 1.0)
-  
-  for combined, title, description, text_score, metadata, thumbnail in zip(combined_scores, titles, descriptions, similarities, metadata_list, thumbnails):
-    score = combined
-    content_lower = f"{title} {description}".lower()
+
+  # Keyword groups this query needs; each item's content is scanned once for all of them
+  fruit_group = ("fruit", query_lower)
+  brand_group = ("brand", query_lower)
+  flower_group = ("flower", query_lower)
+  # How-to and review queries also check items for their intent keywords
+  intent_group = ("intent", detected_intent)
+  keyword_groups = [MUSIC_GROUP] + [
+    group for group in (fruit_group, brand_group, flower_group) if group in KEYWORD_GROUPS
+  ]
+  if detected_intent in ("how_to", "review"):
+    keyword_groups.append(intent_group)
+
+  # Gather per-item signals first; the arithmetic is applied below in bulk
+  item_count = len(texts)
+  recency_boosts = np.ones(item_count)
+  topic_factors = np.ones(item_count)
+  visual_consistency = np.ones(item_count)
+  max_negative_sims = np.zeros(item_count)
+  max_positive_sims = np.zeros(item_count)
+  has_intent_keywords = np.zeros(item_count, dtype=bool)
+  music_counts = np.zeros(item_count, dtype=np.int64)
+  fruit_counts = np.zeros(item_count, dtype=np.int64)
+  brand_counts = np.zeros(item_count, dtype=np.int64)
+  flower_counts = np.zeros(item_count, dtype=np.int64)
+
+  # Similarity-based feedback learning: each item's best cosine against the 20
+  # most recent thumbs-down / thumbs-up items. Each side is encoded in one
+  # batch (through the item-text cache) and compared in a single matmul.
+  if feedback_history and model is not None:
+    current_embeddings = None
+    for side, max_sims in (("negative", max_negative_sims), ("positive", max_positive_sims)):
+      feedback_texts = [
+        f"{item.get('title', '')} {item.get('description', '')}"
+        for item in (feedback_history.get(side) or [])[:20]
+      ]
+      feedback_texts = [text for text in feedback_texts if text.strip()]
+      if not feedback_texts:
+        continue
+      if current_embeddings is None:
+        current_texts = [f"{title} {description}" for title, description in zip(titles, descriptions)]
+        current_embeddings = encode_texts_cached(model, MODEL_NAME, current_texts)
+      feedback_embeddings = encode_texts_cached(model, MODEL_NAME, feedback_texts)
+      best = (current_embeddings @ feedback_embeddings.T).max(dim=1).values.cpu().numpy()
+      max_sims[:] = np.maximum(best, 0.0)
+
+  # Learned negative keyword penalty from user feedback, one batched prediction
+  negative_probs = predict_negative_scores(contents_lower)
+
+  # Cross-modal validation only has visual expectations for some queries,
+  # so skip the per-item call for the rest
+  check_visuals = visual_validation_query(query_lower) is not None
+  is_music_query = any(kw in query_lower for kw in ["song", "music", "singer", "band", "album", "lyrics"])
+  is_fruit_query = query_lower in FRUIT_KEYWORDS
+
+  # Keyword pre-pass: one automaton scan per item covers topics and every group above
+  features = [
+    extract_item_features(content_lower, metadata, keyword_groups)
+    for content_lower, metadata in zip(contents_lower, metadata_list)
+  ]
+
+  for i, item in enumerate(features):
+    content_lower = item.content_lower
+    keyword_counts = item.keyword_counts
+    music_counts[i] = keyword_counts[MUSIC_GROUP]
+    fruit_counts[i] = keyword_counts.get(fruit_group, 0)
+    brand_counts[i] = keyword_counts.get(brand_group, 0)
+    flower_counts[i] = keyword_counts.get(flower_group, 0)
+    has_intent_keywords[i] = keyword_counts.get(intent_group, 0) > 0
     
     # Apply temporal recency boosting (especially for trending queries)
-    recency_boost = detect_recency(metadata)
-    score *= recency_boost
+    recency_boosts[i] = item.recency
     
-    # Detect topics in content and apply hard filtering for conflicts
-    content_topics = detect_topics(content_lower)
-    score = apply_topic_filtering(score, content_topics, detected_intent)
+    # Hard filtering for topics that conflict with the query intent
+    topic_factors[i] = apply_topic_filtering(1.0, item.topics, detected_intent)
     
+    # Music content on non-music queries and brand-only content on fruit
+    # queries are zeroed by the hard filters below, whatever else they score
+    hard_zero = (music_counts[i] and not is_music_query) or (
+      is_fruit_query and not fruit_counts[i] and brand_counts[i]
+    )
+
     # Cross-modal validation: penalize if image contradicts text
-    visual_consistency = validate_image_text_consistency(title, description, thumbnail, query)
-    score *= visual_consistency
-    
-    # Apply learned negative keyword penalty from user feedback
-    negative_prob = predict_negative_score(content_lower)
-    if negative_prob > 0.6:  # High confidence this is bad content
-      score *= (1.0 - negative_prob)  # Penalize proportionally
-    
-    # Similarity-based feedback learning: compare to historical feedback
-    if feedback_history and model is not None and util is not None:
-      current_text = f"{title} {description}"
-      
-      # Compare to negative feedback (thumbs down)
-      negative_items = feedback_history.get("negative", [])
-      if negative_items:
-        max_negative_sim = 0.0
-        for neg_item in negative_items[:20]:  # Limit to recent 20
-          neg_text = f"{neg_item.get('title', '')} {neg_item.get('description', '')}"
-          if neg_text.strip():
-            neg_emb = model.encode(neg_text, convert_to_tensor=True, normalize_embeddings=True)
-            curr_emb = model.encode(current_text, convert_to_tensor=True, normalize_embeddings=True)
-            sim = util.cos_sim(neg_emb.unsqueeze(0), curr_emb.unsqueeze(0))[0][0].item()
-            max_negative_sim = max(max_negative_sim, sim)
-        
-        # If very similar to thumbs-down content (>0.75), heavily penalize
-        if max_negative_sim > 0.75:
-          score *= 0.1  # 90% penalty for very similar to disliked content
-        elif max_negative_sim > 0.6:
-          score *= 0.4  # 60% penalty for moderately similar
-        elif max_negative_sim > 0.45:
-          score *= 0.7  # 30% penalty for somewhat similar
-      
-      # Compare to positive feedback (thumbs up)
-      positive_items = feedback_history.get("positive", [])
-      if positive_items:
-        max_positive_sim = 0.0
-        for pos_item in positive_items[:20]:  # Limit to recent 20
-          pos_text = f"{pos_item.get('title', '')} {pos_item.get('description', '')}"
-          if pos_text.strip():
-            pos_emb = model.encode(pos_text, convert_to_tensor=True, normalize_embeddings=True)
-            curr_emb = model.encode(current_text, convert_to_tensor=True, normalize_embeddings=True)
-            sim = util.cos_sim(pos_emb.unsqueeze(0), curr_emb.unsqueeze(0))[0][0].item()
-            max_positive_sim = max(max_positive_sim, sim)
-        
-        # If very similar to thumbs-up content (>0.75), strongly boost
-        if max_positive_sim > 0.75:
-          score = min(score * 2.5, 1.0)  # 150% boost for very similar to liked content
-        elif max_positive_sim > 0.6:
-          score = min(score * 1.8, 1.0)  # 80% boost for moderately similar
-        elif max_positive_sim > 0.45:
-          score = min(score * 1.3, 1.0)  # 30% boost for somewhat similar
-    
-    # HARD FILTER: Completely eliminate music/entertainment content for non-music queries
-    is_music_query = any(kw in query_lower for kw in ["song", "music", "singer", "band", "album", "lyrics"])
-    music_penalty_count = sum(1 for kw in MUSIC_KEYWORDS if kw in content_lower)
-    music_penalty_applied = False
-    
-    if not is_music_query:  # Only penalize music if query isn't music-related
-      if music_penalty_count >= 1:  # ANY music keyword = complete elimination
-        score = 0.0  # Completely remove music videos
-        music_penalty_applied = True
-    
-    # Apply intent-based weighting
-    # If query intent is "how_to" but content has no tutorial keywords, penalize
-    if detected_intent == "how_to":
-      has_howto = any(kw in content_lower for kw in INTENT_KEYWORDS["how_to"])
-      if has_howto:
-        score *= 1.5  # Strong boost for tutorials when user wants howto
-      else:
-        score *= 0.8  # Slight penalty if not tutorial-like
-    elif detected_intent == "review":
-      has_review = any(kw in content_lower for kw in INTENT_KEYWORDS["review"])
-      if has_review:
-        score *= 1.3
-      else:
-        score *= 0.85
-    
-    # For ambiguous queries like "apple", check if ANY fruit keywords exist
-    # If NO fruit keywords found, assume it's brand content and penalize heavily
-    if query_lower in FRUIT_KEYWORDS:
-      boost_keywords = FRUIT_KEYWORDS[query_lower]
-      boost_matches = sum(1 for kw in boost_keywords if kw in content_lower)
-      brand_matches = sum(1 for kw in BRAND_KEYWORDS.get(query_lower, []) if kw in content_lower)
-
-      # If NO fruit keywords present, assume it's brand/tech and nuke the score
-      if boost_matches == 0:
-        if brand_matches > 0:
-          score = 0.0  # hard reject brand/tech when no fruit context
-        else:
-          score *= 0.01   # 99% penalty: no fruit keywords at all
-
-      # If brand keywords present even with some fruit, still penalize
-      elif brand_matches >= 2:
-        score *= 0.02  # 98% penalty for multiple brand keywords
-      elif brand_matches == 1:
-        score *= 0.05  # 95% penalty for single brand keyword
-
-      # Strong boost for fruit keywords when present
-      if boost_matches >= 3:
-        score = min(score * 4.0, 1.0)  # Major boost for 3+ matches
-      elif boost_matches == 2:
-        score = min(score * 3.0, 1.0)
-      elif boost_matches == 1:
-        score = min(score * 2.0, 1.0)
-    
-    # Boost flower keywords with stacking - prioritize craft/DIY/gardening content
-    # Don't apply "no keywords" penalty if music penalty already applied (avoid double-penalty)
-    elif query_lower in FLOWER_KEYWORDS:
-      boost_keywords = FLOWER_KEYWORDS[query_lower]
-      boost_matches = sum(1 for kw in boost_keywords if kw in content_lower)
-      
-      # If NO flower keywords at all AND not already music-penalized, penalize
-      if boost_matches == 0 and not music_penalty_applied:
-        score *= 0.1  # 90% penalty (less aggressive than before)
-      # Strong progressive boost for flower content
-      elif boost_matches >= 5:
-        score = min(score * 6.0, 1.0)  # Massive boost for 5+ matches (detailed craft/gardening)
-      elif boost_matches == 4:
-        score = min(score * 4.5, 1.0)
-      elif boost_matches == 3:
-        score = min(score * 3.5, 1.0)
-      elif boost_matches == 2:
-        score = min(score * 2.5, 1.0)
-      elif boost_matches == 1:
-        score = min(score * 1.8, 1.0)
-    
-    # Require minimum semantic similarity for text-based results
-    if text_score < 0.2:  # Raised from 0.15 - stricter filtering
-      score *= 0.15
-    
-    adjusted_scores.append(max(score, 0.0))
-
-  ranked = sorted(
-    (
-      {
-        "id": id_value,
-        "score": adjusted,
-        "title": title,
-        "text": text,
-        "description": description,
-        "thumbnail": thumbnail,
-        "image_score": image_score,
-        "text_score": text_score,
-      }
-      for id_value, adjusted, title, text, description, thumbnail, image_score, text_score in zip(
-        ids,
-        adjusted_scores,
-        titles,
-        texts,
-        descriptions,
-        thumbnails,
-        image_scores,
-        similarities,
-      )
-    ),
-    key=lambda row: row["score"],
-    reverse=True,
-  )
+    # (skipped when the thumbnail was gated out or failed to load)
+    if check_visuals and has_image[i] and not hard_zero:
+      visual_consistency[i] = validate_image_text_consistency(content_lower, thumbnail_embeddings[i], query)
 
-  response = jsonify({"ranked": ranked, "query_intent": detected_intent})
-  return response
+  scores = combined * recency_boosts * topic_factors * visual_consistency
 
+  # High confidence the content is bad: penalize proportionally
+  scores = np.where(negative_probs > 0.6, scores * (1.0 - negative_probs), scores)
 
-def compute_image_score(url: str, clip_query: torch.Tensor) -> Optional[float]:
-  if not url:
-    return None
-  embedding = fetch_image_embedding(url)
-  if embedding is None:
-    return None
-  with torch.no_grad():
-    query_vec = clip_query.unsqueeze(0)
-    score = util.cos_sim(query_vec, embedding.unsqueeze(0))[0][0].item()
-  return normalize_clip_score(score)
+  # Very similar to thumbs-down content gets 90% / 60% / 30% penalties
+  scores *= np.select(
+    [max_negative_sims > 0.75, max_negative_sims > 0.6, max_negative_sims > 0.45],
+    [0.1, 0.4, 0.7],
+    1.0,
+  )
+  # Very similar to thumbs-up content gets 150% / 80% / 30% boosts
+  scores = apply_capped_boost(scores, np.select(
+    [max_positive_sims > 0.75, max_positive_sims > 0.6, max_positive_sims > 0.45],
+    [2.5, 1.8, 1.3],
+    1.0,
+  ))
+  
+  # HARD FILTER: Completely eliminate music/entertainment content for non-music queries
+  if is_music_query:
+    music_penalty_applied = np.zeros(item_count, dtype=bool)
+  else:
+    music_penalty_applied = music_counts >= 1  # ANY music keyword = complete elimination
+  scores[music_penalty_applied] = 0.0
+  
+  # Apply intent-based weighting
+  # If query intent is "how_to" but content has no tutorial keywords, penalize
+  if detected_intent == "how_to":
+    scores *= np.where(has_intent_keywords, 1.5, 0.8)
+  elif detected_intent == "review":
+    scores *= np.where(has_intent_keywords, 1.3, 0.85)
+  
+  # For ambiguous queries like "apple", check if ANY fruit keywords exist
+  # If NO fruit keywords found, assume it's brand content and penalize heavily
+  if is_fruit_query:
+    no_fruit = fruit_counts == 0
+    scores *= np.select(
+      [
+        no_fruit & (brand_counts > 0),  # hard reject brand/tech when no fruit context
+        no_fruit,                       # 99% penalty: no fruit keywords at all
+        brand_counts >= 2,              # 98% penalty for multiple brand keywords
+        brand_counts == 1,              # 95% penalty for single brand keyword
+      ],
+      [0.0, 0.01, 0.02, 0.05],
+      1.0,
+    )
+    # Strong boost for fruit keywords when present
+    scores = apply_capped_boost(scores, np.select(
+      [fruit_counts >= 3, fruit_counts == 2, fruit_counts == 1],
+      [4.0, 3.0, 2.0],
+      1.0,
+    ))
+  
+  # Boost flower keywords with stacking - prioritize craft/DIY/gardening content
+  # Don't apply "no keywords" penalty if music penalty already applied (avoid double-penalty)
+  elif query_lower in FLOWER_KEYWORDS:
+    scores *= np.where((flower_counts == 0) & ~music_penalty_applied, 0.1, 1.0)
+    # Strong progressive boost for flower content
+    scores = apply_capped_boost(scores, np.select(
+      [flower_counts >= 5, flower_counts == 4, flower_counts == 3, flower_counts == 2, flower_counts == 1],
+      [6.0, 4.5, 3.5, 2.5, 1.8],
+      1.0,
+    ))
+  
+  # Require minimum semantic similarity for text-based results
+  scores = np.where(text_arr < 0.2, scores * 0.15, scores)  # Raised from 0.15 - stricter filtering
+
+  adjusted = np.maximum(scores, 0.0)
+
+  # Stable descending sort: ties keep their original item order, so the
+  # optional top_k is always a prefix of the full ranking
+  order = np.argsort(-adjusted, kind="stable")
+  if isinstance(top_k, int) and 0 < top_k < item_count:
+    order = order[:top_k]
+
+  # Back to Python values once, at the response boundary
+  adjusted_scores: List[float] = adjusted.tolist()
+  text_scores: List[float] = text_arr.tolist()
+  image_scores: List[Optional[float]] = [
+    score if present else None for score, present in zip(image_arr.tolist(), has_image.tolist())
+  ]
+  ranked = [
+    {
+      "id": ids[i],
+      "score": adjusted_scores[i],
+      "title": titles[i],
+      "text": texts[i],
+      "description": descriptions[i],
+      "thumbnail": thumbnails[i],
+      "image_score": image_scores[i],
+      "text_score": text_scores[i],
+    }
+    for i in order.tolist()
+  ]
 
+  return json_response({"ranked": ranked, "query_intent": detected_intent})
 
-def compute_image_score_expanded(url: str, clip_queries: torch.Tensor) -> Optional[float]:
-  """Compute max image score across expanded query variants."""
-  if not url:
-    return None
-  embedding = fetch_image_embedding(url)
-  if embedding is None:
-    return None
-  with torch.no_grad():
-    max_score = max(
-      util.cos_sim(qe.unsqueeze(0), embedding.unsqueeze(0))[0][0].item()
-      for qe in clip_queries
-    )
-  return normalize_clip_score(max_score)
 
+def score_image_embeddings(
+  embeddings: List[Optional[torch.Tensor]], clip_queries: torch.Tensor
+) -> np.ndarray:
+  """Score thumbnail embeddings against all query variants in a single matmul.
 
-def fetch_image_embedding(url: str) -> Optional[torch.Tensor]:
-  cached = image_cache.get(url)
-  if cached is not None:
-    return cached
+  Each thumbnail keeps its best variant score, normalized to [0, 1]. Missing
+  embeddings are NaN so callers fall back to the text score. Both sides are
+  L2-normalized, so cosine similarity is a plain dot product, and the scores
+  cross to the CPU in one copy instead of a sync per thumbnail.
+  """
+  scores = np.full(len(embeddings), np.nan)
+  valid = [index for index, embedding in enumerate(embeddings) if embedding is not None]
+  if not valid:
+    return scores
+  with torch.inference_mode():
+    # Disk-cache hits come back on the CPU, fresh embeddings on the model's device
+    stacked = torch.stack([embeddings[index].to(clip_queries.device) for index in valid]).float()
+    best = (clip_queries @ stacked.T).max(dim=0).values
+    scores[valid] = ((best + 1.0) * 0.5).clamp_(0.0, 1.0).cpu().numpy()
+  return scores
+
+
+def fetch_image_embeddings(urls: List[str]) -> List[Optional[torch.Tensor]]:
+  """Resolve thumbnail embeddings, downloading cache misses in parallel.
+
+  Downloads run on `image_fetch_executor` so network round-trips overlap, and
+  every successfully decoded image is then encoded in a single CLIP batch.
+  """
+  embeddings: List[Optional[torch.Tensor]] = [image_cache.get(url) if url else None for url in urls]
+  missing = [index for index, (url, embedding) in enumerate(zip(urls, embeddings)) if url and embedding is None]
+  if not missing:
+    return embeddings
+
+  # Items often share a thumbnail; download and encode each URL only once
+  missing_urls = list(dict.fromkeys(urls[index] for index in missing))
+  images = list(image_fetch_executor.map(download_image, missing_urls))
+  decoded = []
+  for url, image in zip(missing_urls, images):
+    if image is None:
+      image_cache.set(url, None)
+    else:
+      decoded.append((url, image))
+  if not decoded:
+    return embeddings
 
   try:
-    response = http.get(url, timeout=5)
+    batch = encode_images_batch([image for _, image in decoded])
+  except Exception as exc:  # pylint: disable=broad-except
+    logging.warning("Failed to encode %d thumbnails: %s", len(decoded), exc)
+    return embeddings
+
+  fresh: Dict[str, torch.Tensor] = {}
+  for (url, _), embedding in zip(decoded, batch):
+    # Cache compact fp16 copies; scoring upcasts them back to fp32
+    embedding = embedding.detach().to(dtype=torch.float16).contiguous()
+    image_cache.set(url, embedding)
+    fresh[url] = embedding
+  for index in missing:
+    embeddings[index] = fresh.get(urls[index])
+  return embeddings
+
+
+def download_image(url: str) -> Optional[Image.Image]:
+  """Fetch and decode a thumbnail. Pure IO, safe to run on worker threads."""
+  try:
+    response = http.get(url)
     response.raise_for_status()
-    with Image.open(io.BytesIO(response.content)) as image:
-      image_rgb = image.convert("RGB")
-      with torch.no_grad():
-        embedding = clip_model.encode(
-          [image_rgb],
-          convert_to_tensor=True,
-          normalize_embeddings=True,
-          show_progress_bar=False,
-        )[0]
+    return decode_image(response.content)
   except Exception as exc:  # pylint: disable=broad-except
     logging.warning("Failed to fetch thumbnail %s: %s", url, exc)
-    image_cache.set(url, None)
     return None
 
-  image_cache.set(url, embedding)
-  return embedding
 
+def decode_image(blob: bytes) -> Image.Image:
+  """Decode thumbnail bytes, on the decode process pool when one is configured.
 
-def normalize_clip_score(value: float) -> float:
-  scaled = (value + 1.0) / 2.0
-  if scaled < 0.0:
-    return 0.0
-  if scaled > 1.0:
-    return 1.0
-  return float(scaled)
+  Worker processes decode in true parallel and send back a small uint8 array
+  already shrunk to CLIP's input size.
+  """
+  if image_decode_pool is None:
+    return decode_thumbnail_image(blob)
+  return Image.fromarray(image_decode_pool.decode(blob))
+
+
+def encode_images_batch(images: List[Image.Image]) -> torch.Tensor:
+  """Encode decoded thumbnails with CLIP in as few forward passes as possible."""
+  return encode(clip_model, images, batch_size=IMAGE_ENCODE_BATCH_SIZE)
+
+
+# WSGI entry point for production servers, e.g. `gunicorn -c gunicorn.conf.py`
+application = app
 
 
 if __name__ == "__main__":
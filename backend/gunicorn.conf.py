@@ -0,0 +1,47 @@
+"""Gunicorn settings for serving the backend with several concurrent requests.
+
+Run from the project root with:
+
+    gunicorn -c backend/gunicorn.conf.py
+
+`preload_app` imports app.py (and loads every model) once in the master
+process before forking, so workers share the model weights copy-on-write
+instead of each holding their own ~800 MB copy. That includes graphs
+compiled at startup with AIS_TORCH_COMPILE=1, until a worker touches them.
+
+Preloading is CPU-only: CUDA and Apple MPS cannot be used from a forked
+child once the parent has initialized them, so when the models would run on
+a GPU a single worker is started without preload and loads them itself.
+"""
+
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "app:application"
+bind = os.environ.get("AIS_BIND", "127.0.0.1:5000")
+
+
+def accelerator_available() -> bool:
+  """Whether app.py will place the models on a GPU (CUDA or Apple MPS)."""
+  device = os.environ.get("AIS_DEVICE")
+  if device:
+    return not device.startswith("cpu")
+  if os.environ.get("AIS_ENABLE_ML", "0") != "1":
+    return False
+  # Ask NVML for the device count so the master never initializes CUDA itself
+  os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+  try:
+    import torch
+  except ImportError:
+    return False
+  return torch.cuda.is_available() or torch.backends.mps.is_available()
+
+
+on_gpu = accelerator_available()
+preload_app = not on_gpu
+workers = 1 if on_gpu else int(os.environ.get("WEB_CONCURRENCY", "2"))
+# Split the CPUs between workers so their torch thread pools do not oversubscribe
+os.environ.setdefault("AIS_TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
+worker_class = "gthread"
+threads = 16
+timeout = 60
@@ -0,0 +1,45 @@
+"""Thumbnail decoding shared by the request threads and the decode worker processes.
+
+Kept out of app.py so spawned worker processes import only Pillow and NumPy,
+never the models.
+"""
+
+from __future__ import annotations
+
+import io
+
+import numpy as np
+from PIL import Image
+
+CLIP_IMAGE_SIZE = 224  # ViT-B/32 input resolution
+# Formats YouTube/Instagram serve thumbnails in; Pillow only probes these
+THUMBNAIL_FORMATS = ("JPEG", "PNG", "WEBP")
+
+
+def shrink_for_clip(image: Image.Image) -> Image.Image:
+  """Downscale so the short side matches CLIP's input size, keeping aspect ratio.
+
+  CLIP's preprocessing does the same bicubic resize; doing it at decode time
+  keeps that work off the batched encode.
+  """
+  width, height = image.size
+  short_side = min(width, height)
+  if short_side <= CLIP_IMAGE_SIZE:
+    return image
+  scale = CLIP_IMAGE_SIZE / short_side
+  size = (max(CLIP_IMAGE_SIZE, round(width * scale)), max(CLIP_IMAGE_SIZE, round(height * scale)))
+  return image.resize(size, Image.Resampling.BICUBIC)
+
+
+def decode_thumbnail_image(blob: bytes) -> Image.Image:
+  """Decode raw thumbnail bytes into a CLIP-sized RGB image."""
+  with Image.open(io.BytesIO(blob), formats=THUMBNAIL_FORMATS) as image:
+    # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale straight from the DCT
+    # coefficients; draft picks the smallest that still covers CLIP's input
+    image.draft("RGB", (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE))
+    return shrink_for_clip(image.convert("RGB"))
+
+
+def decode_thumbnail(blob: bytes) -> np.ndarray:
+  """Process-pool entry point: decode to a compact uint8 HxWx3 array."""
+  return np.asarray(decode_thumbnail_image(blob), dtype=np.uint8)
@@ -0,0 +1,102 @@
+"""Regression tests for the /search and /feedback endpoints in fallback mode.
+
+Run from the project root with `python -m pytest backend`.
+"""
+
+import os
+
+os.environ["AIS_ENABLE_ML"] = "0"  # lightweight scorer, no model downloads
+
+import pytest
+
+import app as backend
+
+ITEMS = [
+  {"id": "pie", "text": "apple pie recipe", "title": "Apple pie recipe",
+   "description": "bake a fruit pie with fresh apples", "metadata": "2 days ago"},
+  {"id": "iphone", "text": "apple iphone review", "title": "iPhone 15 review",
+   "description": "apple tech device unboxing"},
+  {"id": "orchard", "text": "apple orchard harvest", "title": "Apple orchard",
+   "description": "picking organic fruit in the orchard", "metadata": "1 year ago"},
+  {"id": "song", "text": "apple song music video", "title": "Apple song",
+   "description": "official music video"},
+  {"id": "garden", "text": "how to plant a flower garden", "title": "How to plant flowers",
+   "description": "beginner gardening tutorial step by step", "metadata": "3 hours ago"},
+  {"id": "bouquet", "text": "flower bouquet ideas", "title": "Bouquet ideas",
+   "description": "rose and tulip arrangements"},
+]
+
+
+@pytest.fixture
+def client():
+  return backend.app.test_client()
+
+
+def search(client, **payload):
+  response = client.post("/search", json={"items": ITEMS, **payload})
+  assert response.status_code == 200
+  return response.get_json()
+
+
+# Scores produced by the original per-item scoring loop; the vectorized
+# NumPy ranking and the automaton keyword counts must reproduce them.
+BASELINE = {
+  "apple": ("factual", [
+    ("pie", 1.0), ("orchard", 1.0), ("iphone", 0.0), ("song", 0.0), ("garden", 0.0), ("bouquet", 0.0),
+  ]),
+  "flower": ("factual", [
+    ("bouquet", 1 / 3), ("garden", 0.0375), ("pie", 0.0), ("iphone", 0.0), ("orchard", 0.0), ("song", 0.0),
+  ]),
+  "how to plant a flower garden": ("how_to", [
+    ("garden", 2.25), ("bouquet", 0.015), ("pie", 0.0), ("iphone", 0.0), ("orchard", 0.0), ("song", 0.0),
+  ]),
+  "iphone review": ("review", [
+    ("iphone", 13 / 15), ("pie", 0.0), ("orchard", 0.0), ("song", 0.0), ("garden", 0.0), ("bouquet", 0.0),
+  ]),
+}
+
+
+@pytest.mark.parametrize("query", sorted(BASELINE))
+def test_search_matches_baseline_scores(client, query):
+  intent, expected = BASELINE[query]
+  result = search(client, query=query)
+  assert result["query_intent"] == intent
+  assert [row["id"] for row in result["ranked"]] == [item_id for item_id, _ in expected]
+  assert [row["score"] for row in result["ranked"]] == pytest.approx([score for _, score in expected])
+
+
+@pytest.mark.parametrize("query", ["apple", "flower", "music"])
+def test_top_k_is_prefix_of_full_ranking(client, query):
+  # Repeated items tie exactly, including on the hard-filter 0.0 scores
+  full = [row["id"] for row in search(client, query=query)["ranked"]]
+  for k in range(1, len(ITEMS)):
+    ranked = search(client, query=query, top_k=k)["ranked"]
+    assert [row["id"] for row in ranked] == full[:k]
+
+
+def test_top_k_ties_keep_item_order(client):
+  items = [{"id": i, "text": "apple pie" if i % 2 else "apple tart"} for i in range(8)]
+  response = client.post("/search", json={"query": "apple pie", "items": items, "top_k": 3})
+  assert [row["id"] for row in response.get_json()["ranked"]] == [1, 3, 5]
+
+
+def test_search_accepts_null_feedback_lists(client, monkeypatch):
+  # Feedback similarity only runs with a text model loaded; any object will
+  # do, because null lists must be skipped before anything is encoded
+  monkeypatch.setattr(backend, "model", object())
+  result = search(client, query="apple", feedback={"negative": None, "positive": None})
+  assert [row["id"] for row in result["ranked"]][:2] == ["pie", "orchard"]
+
+
+def test_feedback_accepts_null_fields(client):
+  feedback_data = [
+    {"title": None, "description": None, "feedback": "down" if i % 2 else "up"} for i in range(12)
+  ]
+  response = client.post("/feedback", json={"feedback_data": feedback_data})
+  assert response.status_code == 200
+  assert response.get_json()["samples"] == 12
+
+
+def test_feedback_requires_data(client):
+  response = client.post("/feedback", json={"feedback_data": None})
+  assert response.status_code == 400